@@ -1,13 +1,23 @@
 import os
 import tkinter as tk
 from tkinter import filedialog, messagebox, ttk
-from PIL import Image, ImageDraw, ImageFont, ImageOps
+from PIL import Image, ImageChops, ImageDraw, ImageFont, ImageOps
 import json
 import requests
 import threading
 import time
 import sys # ¡Importar sys para PyInstaller!
 import random
+import argparse
+import socket
+import sqlite3
+import io
+import tempfile
+import cProfile
+import pstats
+import tracemalloc
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
 
 # --- Configuración para los sonidos ---
 SOUND_FILE = 'success_sound.wav'
@@ -21,6 +31,779 @@ except ImportError:
     PYGAME_MIXER_AVAILABLE = False
     print("Advertencia: pygame no está instalado o no se pudo importar. Los sonidos pueden no reproducirse en todos los sistemas operativos.")
 
+# resource (pico de memoria del proceso) solo existe en sistemas Unix
+try:
+    import resource
+except ImportError:
+    resource = None
+
+# Intentar importar pyvips para el motor de render acelerado opcional (requiere libvips)
+try:
+    import pyvips
+    PYVIPS_AVAILABLE = True
+except (ImportError, OSError):
+    PYVIPS_AVAILABLE = False
+
+# --- Configuración del procesamiento de imágenes ---
+FONT_NAME = "Poppins-Medium.ttf"
+SUPPORTED_EXTENSIONS = ('.png', '.jpg', '.jpeg', '.bmp', '.gif', '.tiff', '.jfif', '.webp')
+
+# Mensaje principal para cada estado final de un lote
+FINAL_MESSAGES = {
+    "success": "Proceso de marca de agua finalizado con éxito.",
+    "partial_success": "Algunas imágenes se crearon satisfactoriamente y otras no.",
+    "no_images_processed": "No se pudo procesar ninguna imagen.",
+}
+UNKNOWN_ERROR_MESSAGE = "Se produjo un error inesperado durante el procesamiento."
+
+
+def get_font(font_size, font_name=FONT_NAME):
+    """
+    Intenta cargar la fuente Poppins. Si no está disponible localmente, usará la predeterminada.
+    """
+    # Determina la ruta base para la fuente
+    base_path = sys._MEIPASS if hasattr(sys, '_MEIPASS') else os.path.dirname(os.path.abspath(__file__))
+    font_full_path = os.path.join(base_path, font_name)
+
+    if os.path.exists(font_full_path):
+        try:
+            return ImageFont.truetype(font_full_path, font_size)
+        except IOError:
+            print(f"Error al cargar la fuente en {font_full_path}. Usando la fuente predeterminada de Pillow.")
+            return ImageFont.load_default()
+    else:
+        print(f"No se encontró la fuente Poppins descargada en {font_full_path}. Usando la fuente predeterminada de Pillow.")
+        return ImageFont.load_default()
+
+
+# Colores de la marca de agua
+FILL_COLOR = (255, 255, 255, 255) # Blanco opaco
+STROKE_COLOR = (0, 0, 0, 255)   # Negro opaco
+JPEG_QUALITY = 90
+
+
+def measure_watermark_text(watermark_text, font, stroke_width):
+    """Devuelve la caja (left, top, right, bottom) del texto dibujado en (0, 0), trazo incluido."""
+    draw = ImageDraw.Draw(Image.new("RGBA", (1, 1)))
+    return draw.textbbox((0,0), watermark_text, font=font, stroke_width=stroke_width)
+
+
+def compute_watermark_position(img_width, img_height, text_width, text_height,
+                               water_position, margin, center_offset_value, center_offset_option_selected):
+    """Calcula la esquina superior izquierda de la marca de agua, ajustada a los bordes de la imagen."""
+    x, y = 0.0, 0.0
+
+    if water_position == "top_left":
+        x = margin
+        y = margin
+    elif water_position == "top_right":
+        x = img_width - text_width - margin
+        y = margin
+    elif water_position == "bottom_left":
+        x = margin
+        y = img_height - text_height - margin
+    elif water_position == "bottom_right":
+        x = img_width - text_width - margin
+        y = img_height - text_height - margin
+    elif water_position == "random":
+        effective_max_x = img_width - text_width - margin
+        effective_max_y = img_height - text_height - margin
+
+        x_min = margin
+        y_min = margin
+
+        x = random.randint(x_min if x_min <= effective_max_x else 0, effective_max_x if effective_max_x >= 0 else 0)
+        y = random.randint(y_min if y_min <= effective_max_y else 0, effective_max_y if effective_max_y >= 0 else 0)
+
+
+    elif water_position == "center_options":
+        base_x = (img_width - text_width) / 2
+        base_y = (img_height - text_height) / 2
+
+        if center_offset_option_selected == "center":
+            x = base_x
+            y = base_y
+        elif center_offset_option_selected == "center_offset_up":
+            x = base_x
+            y = base_y - center_offset_value
+        elif center_offset_option_selected == "center_offset_down":
+            x = base_x
+            y = base_y + center_offset_value
+        elif center_offset_option_selected == "center_offset_left":
+            x = base_x - center_offset_value
+            y = base_y
+        elif center_offset_option_selected == "center_offset_right":
+            x = base_x + center_offset_value
+            y = base_y
+
+    x = int(max(0, min(x, img_width - text_width)))
+    y = int(max(0, min(y, img_height - text_height)))
+    return x, y
+
+
+def render_watermark_masks(watermark_text, font, stroke_width):
+    """
+    Rasteriza el texto con Pillow en dos máscaras de cobertura (L): la del trazo (None si
+    stroke_width es 0) y la del relleno. Pintar el negro con la primera y luego el blanco con
+    la segunda da exactamente el mismo resultado que draw.text sobre la imagen.
+    Devuelve (stroke_mask, fill_mask, left, top); (left, top) es el desplazamiento de las
+    máscaras respecto al punto donde se dibuja el texto.
+    """
+    left, top, right, bottom = measure_watermark_text(watermark_text, font, stroke_width)
+    size = (max(right - left, 1), max(bottom - top, 1))
+    origin = (-left, -top)
+
+    fill_mask = Image.new("L", size, 0)
+    ImageDraw.Draw(fill_mask).text(origin, watermark_text, font=font, fill=255)
+
+    stroke_mask = None
+    if stroke_width > 0:
+        stroke_mask = Image.new("L", size, 0)
+        ImageDraw.Draw(stroke_mask).text(origin, watermark_text, font=font, fill=255,
+                                         stroke_width=stroke_width, stroke_fill=255)
+    return stroke_mask, fill_mask, left, top
+
+
+class PillowBackend:
+    """Motor de referencia: todo el pipeline con Pillow, tal como lo hizo siempre la aplicación."""
+    name = "pillow"
+
+    def decode(self, image_path):
+        with Image.open(image_path) as img:
+            img.load()
+        return img
+
+    def supports(self, img):
+        """Indica si este motor puede procesar la imagen decodificada igual que Pillow."""
+        return True
+
+    def describe(self, img):
+        """Devuelve (ancho, alto, modo) de la imagen decodificada."""
+        return img.size[0], img.size[1], img.mode
+
+    def orient(self, img):
+        return ImageOps.exif_transpose(img)
+
+    def size(self, img):
+        return img.size
+
+    def prepare(self, img):
+        """Convierte la imagen al modo de trabajo sobre el que se dibuja la marca."""
+        return img.convert("RGBA")
+
+    def stamp(self, img, x, y, watermark_text, font, stroke_width):
+        draw = ImageDraw.Draw(img)
+        draw.text((x, y), watermark_text, font=font, fill=FILL_COLOR,
+                  stroke_width=stroke_width, stroke_fill=STROKE_COLOR)
+        return img.convert('RGB')
+
+    def encode(self, img):
+        buffer = io.BytesIO()
+        img.save(buffer, format="JPEG", quality=JPEG_QUALITY)
+        return buffer.getvalue()
+
+
+class VipsBackend:
+    """
+    Motor acelerado opcional con libvips (pyvips). libvips procesa la imagen bajo demanda y por
+    franjas, así que decodificar, orientar y estampar solo arman el pipeline: el trabajo real
+    ocurre dentro de encode(), y el historial lo refleja así. El texto se rasteriza con Pillow
+    (render_watermark_masks) para que el resultado coincida con el motor de referencia.
+    """
+    name = "vips"
+
+    def decode(self, image_path):
+        img = pyvips.Image.new_from_file(image_path)
+        if img.get_typeof("orientation") == 0 or img.get("orientation") == 1:
+            # Sin rotación EXIF la imagen se puede leer en modo secuencial (streaming)
+            img = pyvips.Image.new_from_file(image_path, access="sequential")
+        return img
+
+    def supports(self, img):
+        # Solo sRGB y escala de grises de 8 bits (incluye paleta y LA). Con 16 bits libvips reescala
+        # en vez de recortar como Pillow, y con CMYK usa perfiles ICC en vez de la fórmula simple de
+        # Pillow; esas imágenes se procesan con PillowBackend para dar el mismo resultado.
+        return img.format == "uchar" and img.interpretation in ("srgb", "b-w")
+
+    def describe(self, img):
+        return img.width, img.height, img.interpretation
+
+    def orient(self, img):
+        return img.autorot()
+
+    def size(self, img):
+        return img.width, img.height
+
+    def prepare(self, img):
+        # Normalizar a sRGB de 8 bits y 3 bandas, como convert("RGBA") + convert("RGB") en Pillow
+        if img.interpretation != "srgb":
+            img = img.colourspace("srgb")
+        if img.bands > 3:
+            img = img.extract_band(0, n=3)
+        if img.format != "uchar":
+            img = img.cast("uchar")
+        return img
+
+    def stamp(self, img, x, y, watermark_text, font, stroke_width):
+        stroke_mask, fill_mask, left, top = render_watermark_masks(watermark_text, font, stroke_width)
+        # Recortar las máscaras a los bordes de la imagen
+        box_left, box_top = x + left, y + top
+        crop_box = (max(0, -box_left), max(0, -box_top),
+                    min(fill_mask.width, img.width - box_left), min(fill_mask.height, img.height - box_top))
+        if crop_box[0] >= crop_box[2] or crop_box[1] >= crop_box[3]:
+            return img
+
+        layers = []
+        for mask, color in ((stroke_mask, STROKE_COLOR), (fill_mask, FILL_COLOR)):
+            if mask is None:
+                continue
+            mask = mask.crop(crop_box)
+            alpha = pyvips.Image.new_from_memory(mask.tobytes(), mask.width, mask.height, 1, "uchar")
+            layers.append(alpha.new_from_image(list(color[:3])).bandjoin(alpha).copy(interpretation="srgb"))
+
+        offset_x, offset_y = box_left + crop_box[0], box_top + crop_box[1]
+        img = img.composite(layers, "over", x=[offset_x] * len(layers), y=[offset_y] * len(layers))
+        return img.extract_band(0, n=3).cast("uchar")
+
+    def encode(self, img):
+        # Submuestreo de croma 4:2:0 como Pillow, y sin metadatos
+        if pyvips.at_least_libvips(8, 15):
+            return img.jpegsave_buffer(Q=JPEG_QUALITY, subsample_mode="on", keep="none")
+        return img.jpegsave_buffer(Q=JPEG_QUALITY, subsample_mode="on", strip=True)
+
+
+RENDER_BACKENDS = {"pillow": PillowBackend, "vips": VipsBackend}
+DEFAULT_BACKEND = "pillow"
+_backend_instances = {}
+_backend_lock = threading.Lock()
+
+
+def get_backend(name=DEFAULT_BACKEND):
+    """
+    Devuelve el motor de render pedido. Si el motor opcional no está disponible,
+    avisa una sola vez y vuelve a Pillow.
+    """
+    with _backend_lock:
+        if name not in _backend_instances:
+            backend_class = RENDER_BACKENDS.get(name)
+            if backend_class is None:
+                print(f"Advertencia: Motor de render '{name}' desconocido. Se usará Pillow.")
+                backend_class = PillowBackend
+            elif backend_class is VipsBackend and not PYVIPS_AVAILABLE:
+                print("Advertencia: pyvips/libvips no está instalado. Se usará el motor Pillow.")
+                backend_class = PillowBackend
+            _backend_instances[name] = backend_class()
+        return _backend_instances[name]
+
+
+def _create_output_temp(output_folder, output_filename):
+    """
+    Crea el temporal donde se escribe una salida antes de renombrarla. Devuelve (fd, ruta).
+    No se usa tempfile.mkstemp porque crea el archivo con permisos 0600 y os.replace los conserva:
+    en un volumen compartido los demás usuarios no podrían leer las salidas. Con 0o666 se aplica
+    el umask del proceso, igual que al guardar directamente con Pillow.
+    """
+    flags = os.O_CREAT | os.O_EXCL | os.O_WRONLY | getattr(os, 'O_BINARY', 0)
+    while True:
+        # El sufijo aleatorio evita choques entre hilos y entre hosts que escriben en la misma carpeta
+        temp_path = os.path.join(output_folder, f".{output_filename}.{os.urandom(6).hex()}.tmp")
+        try:
+            return os.open(temp_path, flags, 0o666), temp_path
+        except FileExistsError:
+            continue
+
+
+def add_watermark_to_image(image_path, output_folder, watermark_text, font_size,
+                           water_position, margin, center_offset_value, center_offset_option_selected,
+                           stroke_width, font_name=FONT_NAME, stats=None, backend=DEFAULT_BACKEND, profiler=None):
+    """
+    Añade una marca de agua de texto a una imagen individual en la posición especificada.
+    Aplica la orientación EXIF y guarda la salida como JPG.
+    No depende de la interfaz, así que la usan tanto la GUI como los workers sin pantalla.
+    Si se pasa un diccionario en stats, se rellena con los tamaños, las dimensiones,
+    el tiempo de cada etapa y el error (si lo hubo) para el historial de ejecuciones.
+    backend es el nombre del motor de render ("pillow" o "vips").
+    Con un RunProfiler en profiler, la imagen se procesa a través del perfilador.
+    """
+    if profiler is not None:
+        return profiler.process(add_watermark_to_image, image_path, output_folder, watermark_text, font_size,
+                                water_position, margin, center_offset_value, center_offset_option_selected,
+                                stroke_width, font_name=font_name, stats=stats, backend=backend)
+
+    render_backend = get_backend(backend)
+    if stats is None:
+        stats = {}
+    stats.update({'file': os.path.basename(image_path), 'backend': render_backend.name,
+                  'started_at': time.time(), 'timings': {}})
+    if tracemalloc.is_tracing():
+        stats['memory_baseline'] = tracemalloc.get_traced_memory()[0]
+        tracemalloc.reset_peak()
+    t = time.perf_counter()
+    try:
+        stats['input_bytes'] = os.path.getsize(image_path)
+        img = render_backend.decode(image_path)
+        if not render_backend.supports(img):
+            render_backend = get_backend(DEFAULT_BACKEND)
+            stats['backend'] = render_backend.name
+            img = render_backend.decode(image_path)
+        stats['width'], stats['height'], stats['mode'] = render_backend.describe(img)
+        t = _record_stage(stats, "decode", t)
+
+        img = render_backend.orient(img)
+        t = _record_stage(stats, "orient", t)
+
+        img = render_backend.prepare(img)
+        t = _record_stage(stats, "convert", t)
+
+        font = get_font(font_size, font_name)
+
+        bbox = measure_watermark_text(watermark_text, font, stroke_width)
+        text_width = bbox[2] - bbox[0]
+        text_height = bbox[3] - bbox[1]
+
+        img_width, img_height = render_backend.size(img)
+        x, y = compute_watermark_position(img_width, img_height, text_width, text_height,
+                                          water_position, margin, center_offset_value, center_offset_option_selected)
+        t = _record_stage(stats, "layout", t)
+
+        img = render_backend.stamp(img, x, y, watermark_text, font, stroke_width)
+        t = _record_stage(stats, "draw", t)
+
+        output_filename = os.path.splitext(os.path.basename(image_path))[0] + ".jpg"
+        final_output_path = os.path.join(output_folder, output_filename)
+
+        # Codificar en memoria y escribir aparte para medir cada etapa por separado
+        data = render_backend.encode(img)
+        t = _record_stage(stats, "encode", t)
+
+        # Escribir en un temporal y renombrarlo: si dos workers procesan la misma imagen (un lease
+        # vencido), el archivo final es siempre la salida completa de uno de ellos, nunca una mezcla
+        fd, temp_path = _create_output_temp(output_folder, output_filename)
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(data)
+            os.replace(temp_path, final_output_path)
+        except BaseException:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+        _record_stage(stats, "write", t)
+        stats['output_bytes'] = len(data)
+        return True
+    except Exception as e:
+        print(f"Error al procesar la imagen {image_path}: {e}")
+        stats['error_type'] = type(e).__name__
+        stats['error'] = str(e)
+        return False
+
+
+def _record_stage(stats, stage, started):
+    """
+    Guarda la duración de una etapa y devuelve el instante actual para medir la siguiente.
+    Si tracemalloc está activo (modo de perfilado), guarda también el pico de memoria de la etapa
+    por encima de la memoria en uso antes de empezar la imagen.
+    """
+    now = time.perf_counter()
+    stats['timings'][stage] = now - started
+    if tracemalloc.is_tracing():
+        stats.setdefault('memory_peaks', {})[stage] = tracemalloc.get_traced_memory()[1] - stats.get('memory_baseline', 0)
+        tracemalloc.reset_peak()
+    return now
+
+
+def determine_final_message_type(processed_count, skipped_count, total_potential_files):
+    """Determina el estado final de un lote para el mensaje y el icono."""
+    if total_potential_files == 0:
+        # Si no hay archivos compatibles, considera esto como un error en sí mismo
+        return "no_images_processed"
+    if processed_count == total_potential_files and skipped_count == 0:
+        return "success" # Todas procesadas sin errores
+    elif processed_count > 0 and skipped_count > 0:
+        return "partial_success" # Algunas procesadas, otras no
+    elif processed_count == 0 and skipped_count > 0:
+        return "no_images_processed" # Ninguna procesada, solo errores/incompatibles
+    return "unknown_error" # Fallback para cualquier otro caso inesperado
+
+
+def format_summary_message(main_message, processed_count, skipped_count, output_folder):
+    """Construye el texto del resumen final, el mismo para los diálogos y la consola."""
+    return f"{main_message}\n\n" \
+           f"Imágenes procesadas: {processed_count}\n" \
+           f"Imágenes saltadas (no compatibles/error): {skipped_count}\n" \
+           f"Revisa la carpeta: {os.path.abspath(output_folder)}"
+
+
+# --- Planificador adaptativo ---
+SCHEDULER_MEMORY_BUDGET_MB = 1024
+SCHEDULER_MAX_WORKERS = min(32, (os.cpu_count() or 1) * 4)
+SCHEDULER_WINDOW_SECONDS = 1.0    # Duración mínima de cada medición del uso de CPU y del rendimiento
+SCHEDULER_SATURATED_USAGE = 0.9   # Fracción de los núcleos a partir de la cual la CPU se considera llena
+SCHEDULER_MIN_GAIN = 0.25         # Un hilo añadido debe aportar al menos esta fracción de la mejora posible
+
+
+def _bytes_per_pixel(mode):
+    """Bytes por píxel que Pillow reserva en memoria para un modo (los modos multibanda usan 4)."""
+    if mode in ("1", "L", "P"):
+        return 1
+    if mode.startswith("I;16"):
+        return 2
+    return 4
+
+
+def probe_image_cost(image_path):
+    """
+    Estima la memoria (en bytes) que necesita procesar una imagen leyendo solo su cabecera:
+    Image.open no decodifica los píxeles hasta que se llama a load().
+    Cuenta la imagen decodificada, la copia orientada y las copias RGBA y RGB del pipeline.
+    Si la cabecera no se puede leer devuelve 0; el error se registrará al procesarla.
+    """
+    try:
+        with Image.open(image_path) as img:
+            width, height = img.size
+            source_bpp = _bytes_per_pixel(img.mode)
+    except Exception:
+        return 0
+    return width * height * (2 * source_bpp + 4 + 4)
+
+
+class AdaptiveScheduler:
+    """
+    Planificador delante del bucle de procesamiento por lotes.
+
+    - Ordena los trabajos de mayor a menor coste estimado, para que los archivos grandes no
+      queden para el final y alarguen el lote.
+    - Admite un trabajo solo si cabe en el presupuesto de memoria junto con los que están en
+      curso. El orden es estricto: si el siguiente no cabe, se espera a que se libere memoria en
+      vez de adelantar a los pequeños, que volverían a dejar los grandes para el final. Un trabajo
+      más grande que todo el presupuesto se ejecuta solo.
+    - Empieza con un hilo por núcleo y ajusta la cantidad según el uso de CPU de todo el proceso
+      (time.process_time). Solo se añade un hilo si la CPU no está llena mientras quedan trabajos,
+      y se conserva solo si el rendimiento (coste estimado procesado por segundo) sube; si no
+      sube, los hilos compiten por el GIL en vez de esperar E/S (Pillow lo libera al decodificar,
+      convertir y codificar, pero no en el código Python) y se vuelve atrás. Si la CPU está llena,
+      se quitan hilos hasta volver a uno por núcleo. El tiempo de CPU de cada hilo no sirve para
+      esto: con más hilos que núcleos cada uno recibe menos CPU y parecería que espera E/S.
+    """
+
+    def __init__(self, memory_budget_bytes, max_workers=SCHEDULER_MAX_WORKERS):
+        self.memory_budget_bytes = memory_budget_bytes
+        self.max_workers = max(1, max_workers)
+        self.cpu_count = os.cpu_count() or 1
+        self.min_workers = min(self.cpu_count, self.max_workers)
+        self.target_workers = self.min_workers
+        # Techo aprendido: por encima, un hilo más no aumentó el rendimiento
+        self.worker_ceiling = self.max_workers
+        self.cpu_usage = None
+        self._before_growth = None   # (rendimiento, uso de CPU) antes del último hilo añadido
+        self.peak_workers = 0
+
+    def _observe(self, cpu_seconds, wall_seconds, work_done):
+        """
+        Recibe el tiempo de CPU de todo el proceso, el tiempo real y el coste estimado terminado
+        en una ventana de medición con trabajos esperando, y ajusta el objetivo de hilos en uno
+        como mucho.
+        """
+        if wall_seconds <= 0:
+            return
+        usage = cpu_seconds / (wall_seconds * self.cpu_count)  # 1.0 = todos los núcleos ocupados
+        throughput = work_done / wall_seconds
+        self.cpu_usage = usage
+        before_growth, self._before_growth = self._before_growth, None
+        if before_growth is not None:
+            # Mejora posible con un hilo más: la de un hilo medio, limitada por la CPU que quedaba libre
+            throughput_before, usage_before = before_growth
+            possible_gain = min(1 / (self.target_workers - 1), 1 / max(usage_before, 1e-9) - 1)
+            if throughput < throughput_before * (1 + SCHEDULER_MIN_GAIN * possible_gain):
+                # El último hilo no aportó rendimiento: los hilos compiten por el GIL, no esperan E/S
+                self.target_workers -= 1
+                self.worker_ceiling = self.target_workers
+            # Si el hilo sí aportó, se mantiene al menos una ventana más antes de volver a decidir
+            return
+        if usage >= SCHEDULER_SATURATED_USAGE:
+            # CPU llena: los hilos de más solo se reparten los mismos núcleos
+            self.target_workers = max(self.min_workers, self.target_workers - 1)
+        elif self.target_workers < self.worker_ceiling:
+            self._before_growth = (throughput, usage)
+            self.target_workers += 1
+
+    def run(self, jobs, process, heartbeat=None, heartbeat_seconds=None):
+        """
+        Procesa jobs, una lista de (item, coste en bytes), llamando a process(item) en hilos.
+        Devuelve un generador de (item, resultado) en el orden en que terminan, que se consume
+        desde el hilo que llamó (así, por ejemplo, la conexión SQLite de la cola no cambia de hilo).
+        Si se pasa heartbeat, se llama desde ese mismo hilo cada heartbeat_seconds (no más a
+        menudo) mientras haya trabajos en curso, aunque ninguno termine (p. ej. para renovar leases).
+        """
+        pending = sorted(jobs, key=lambda job: job[1], reverse=True)
+        running = {}
+        in_flight_bytes = 0
+        last_heartbeat = time.monotonic()
+        window_wall, window_cpu = time.perf_counter(), time.process_time()
+        window_work = window_done = 0
+        with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+            while pending or running:
+                while pending and len(running) < self.target_workers:
+                    item, cost = pending[0]
+                    if running and in_flight_bytes + cost > self.memory_budget_bytes:
+                        break
+                    pending.pop(0)
+                    running[pool.submit(process, item)] = (item, cost)
+                    in_flight_bytes += cost
+                self.peak_workers = max(self.peak_workers, len(running))
+
+                timeout = None
+                if heartbeat is not None:
+                    timeout = max(0.0, last_heartbeat + heartbeat_seconds - time.monotonic())
+                done, _ = wait(running, timeout=timeout, return_when=FIRST_COMPLETED)
+                # wait() vuelve cada vez que termina una imagen; el heartbeat solo se llama cuando toca,
+                # porque cada llamada puede tomar el bloqueo de escritura de la base compartida
+                if heartbeat is not None and time.monotonic() - last_heartbeat >= heartbeat_seconds:
+                    heartbeat()
+                    last_heartbeat = time.monotonic()
+                for future in done:
+                    item, cost = running.pop(future)
+                    in_flight_bytes -= cost
+                    # Los archivos sin coste estimado (cabecera ilegible) cuentan como un trabajo mínimo
+                    window_work += max(cost, 1)
+                    window_done += 1
+                    yield item, future.result()
+
+                # Cada ventana dura al menos SCHEDULER_WINDOW_SECONDS y dos trabajos terminados por hilo,
+                # para que el rendimiento medido no dependa de en qué momento terminó cada imagen
+                now = time.perf_counter()
+                if now - window_wall >= SCHEDULER_WINDOW_SECONDS and window_done >= 2 * self.target_workers:
+                    # Al vaciarse la cola sobran hilos por falta de trabajo: esas ventanas no cuentan
+                    if pending:
+                        self._observe(time.process_time() - window_cpu, now - window_wall, window_work)
+                    window_wall, window_cpu = now, time.process_time()
+                    window_work = window_done = 0
+
+
+# --- Historial de ejecuciones ---
+RUN_HISTORY_FILE = "run_history.jsonl"
+HISTORY_STAGES = ("decode", "orient", "convert", "layout", "draw", "encode", "write")
+
+
+def format_megabytes(num_bytes):
+    return f"{num_bytes / 1e6:.1f} MB"
+
+
+def make_run_id(started_at):
+    """Identificador de una ejecución: fecha y hora de inicio más el pid del proceso."""
+    return time.strftime("%Y%m%d-%H%M%S", time.localtime(started_at)) + f"-{os.getpid()}"
+
+
+def unsupported_file_stats(filename):
+    """Entrada del historial para un archivo que se salta por no tener un formato compatible."""
+    return {'file': filename, 'error_type': "UnsupportedFormat", 'error': "Formato no compatible", 'timings': {}}
+
+
+def build_run_record(mode, input_folder, output_folder, settings, file_stats,
+                     processed_count, skipped_count, final_message_type, started_at, elapsed_seconds,
+                     peak_workers=None):
+    """
+    Construye el registro de una ejecución: configuración, métricas por archivo y rendimiento agregado.
+    peak_workers es el máximo de hilos simultáneos del planificador; en la cola distribuida cada
+    host tiene sus propios hilos, así que no se registra.
+    """
+    ok_files = [f for f in file_stats if not f.get('error')]
+    input_bytes = sum(f.get('input_bytes', 0) for f in ok_files)
+    output_bytes = sum(f.get('output_bytes', 0) for f in ok_files)
+    busy_seconds = sum(sum(f.get('timings', {}).values()) for f in file_stats)
+    elapsed = max(elapsed_seconds, 1e-9)
+    throughput = {
+        'elapsed_seconds': round(elapsed_seconds, 4),
+        'busy_seconds': round(busy_seconds, 4),
+        'images_per_second': round(processed_count / elapsed, 3),
+        'input_mb_per_second': round(input_bytes / 1e6 / elapsed, 3),
+        'input_bytes': input_bytes,
+        'output_bytes': output_bytes,
+    }
+    if peak_workers is not None:
+        throughput['peak_workers'] = peak_workers
+    return {
+        'run_id': make_run_id(started_at),
+        'started_at': time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(started_at)),
+        'mode': mode,
+        'input_folder': os.path.abspath(input_folder),
+        'output_folder': os.path.abspath(output_folder),
+        'settings': settings,
+        'processed_count': processed_count,
+        'skipped_count': skipped_count,
+        'final_message_type': final_message_type,
+        'throughput': throughput,
+        'files': file_stats,
+    }
+
+
+def append_run_record(record, history_file=RUN_HISTORY_FILE):
+    """Añade una ejecución al historial JSONL (una línea por ejecución)."""
+    try:
+        with open(history_file, 'a', encoding='utf-8') as f:
+            f.write(json.dumps(record, ensure_ascii=False) + "\n")
+    except OSError as e:
+        print(f"Advertencia: No se pudo guardar el historial de ejecuciones en '{history_file}': {e}")
+
+
+def load_run_history(history_file=RUN_HISTORY_FILE):
+    """Lee el historial de ejecuciones. Las líneas corruptas se ignoran con una advertencia."""
+    records = []
+    if not os.path.exists(history_file):
+        return records
+    with open(history_file, 'r', encoding='utf-8') as f:
+        for line_number, line in enumerate(f, start=1):
+            if not line.strip():
+                continue
+            try:
+                records.append(json.loads(line))
+            except json.JSONDecodeError:
+                print(f"Advertencia: Línea {line_number} del historial corrupta; se ignora.")
+    return records
+
+
+def query_slowest_files(records, limit=10):
+    """Devuelve [(segundos, registro, archivo)] de los archivos procesados más lentos."""
+    rows = []
+    for record in records:
+        for file_entry in record.get('files', []):
+            if file_entry.get('error') or not file_entry.get('timings'):
+                continue
+            rows.append((sum(file_entry['timings'].values()), record, file_entry))
+    rows.sort(key=lambda row: row[0], reverse=True)
+    return rows[:limit]
+
+
+def query_failure_reasons(records):
+    """Devuelve [(tipo de error, cantidad, ejemplo)] ordenado por frecuencia."""
+    counts = Counter()
+    examples = {}
+    for record in records:
+        for file_entry in record.get('files', []):
+            if file_entry.get('error'):
+                error_type = file_entry.get('error_type', "Error")
+                counts[error_type] += 1
+                examples[error_type] = f"{file_entry['file']}: {file_entry['error']}"
+    return [(error_type, count, examples[error_type]) for error_type, count in counts.most_common()]
+
+
+def query_throughput(records):
+    """Devuelve el rendimiento agregado de cada ejecución, en orden cronológico."""
+    return [(record['started_at'], record['mode'], record['processed_count'], record['skipped_count'],
+             record['throughput']) for record in records]
+
+
+# --- Modo de perfilado ---
+PROFILE_FOLDER = "profiles"
+PROFILE_SAMPLE_EVERY = 10   # Una de cada N imágenes se ejecuta bajo cProfile (0 = ninguna)
+PROFILE_TOP_FUNCTIONS = 20
+
+
+class RunProfiler:
+    """
+    Perfilado de un lote: suma los tiempos por etapa que ya mide add_watermark_to_image,
+    ejecuta una muestra de las imágenes bajo cProfile y sigue los picos de memoria con
+    tracemalloc. Al terminar escribe un archivo .pstats y un informe de texto.
+    Solo existe cuando se activa el modo de perfilado; sin él no se crea ni se consulta nada.
+    Con varios hilos en curso, los picos de tracemalloc por etapa incluyen lo que reservan los
+    demás hilos; para aislar una imagen conviene limitar el worker a un hilo (--max-workers 1).
+    """
+
+    def __init__(self, run_id, output_folder=PROFILE_FOLDER, sample_every=PROFILE_SAMPLE_EVERY):
+        self.run_id = run_id
+        self.output_folder = output_folder
+        self.sample_every = sample_every
+        self.file_count = 0
+        self.sampled_count = 0
+        self.stage_totals = Counter()
+        # Imágenes que llegaron a cada etapa: una imagen que falla no cuenta en las siguientes
+        self.stage_counts = Counter()
+        self.stage_memory_peaks = Counter()
+        self.peak_traced = 0
+        self.profile_stats = None
+        # _lock protege solo los contadores y acumuladores (secciones cortas). cProfile no admite dos
+        # perfiladores activos a la vez, así que las muestras se serializan con su propio lock
+        # para no bloquear a los hilos que procesan imágenes sin perfilar.
+        self._lock = threading.Lock()
+        self._profile_lock = threading.Lock()
+
+    def start(self):
+        tracemalloc.start()
+
+    def process(self, func, *args, **kwargs):
+        """Ejecuta func para una imagen (bajo cProfile si le toca muestra) y acumula sus métricas."""
+        stats = kwargs.get('stats')
+        if stats is None:
+            stats = kwargs['stats'] = {}
+        with self._lock:
+            # La primera muestra es la imagen N, no la primera, para no medir el arranque de Pillow
+            sampled = self.sample_every > 0 and self.file_count % self.sample_every == self.sample_every - 1
+            self.file_count += 1
+
+        if sampled:
+            with self._profile_lock:
+                profile = cProfile.Profile()
+                result = profile.runcall(func, *args, **kwargs)
+            with self._lock:
+                if self.profile_stats is None:
+                    self.profile_stats = pstats.Stats(profile)
+                else:
+                    self.profile_stats.add(profile)
+                self.sampled_count += 1
+        else:
+            result = func(*args, **kwargs)
+
+        with self._lock:
+            self.stage_totals.update(stats.get('timings', {}))
+            self.stage_counts.update(stats.get('timings', {}).keys())
+            for stage, peak in stats.get('memory_peaks', {}).items():
+                self.stage_memory_peaks[stage] = max(self.stage_memory_peaks[stage], peak)
+                self.peak_traced = max(self.peak_traced, stats.get('memory_baseline', 0) + peak)
+        return result
+
+    def finish(self):
+        """Detiene tracemalloc y escribe el .pstats y el informe. Devuelve la ruta del informe."""
+        # reset_peak() se llama en cada etapa, así que el pico global se lleva en process()
+        peak_traced = max(self.peak_traced, tracemalloc.get_traced_memory()[1] if tracemalloc.is_tracing() else 0)
+        tracemalloc.stop()
+        os.makedirs(self.output_folder, exist_ok=True)
+        base_path = os.path.join(self.output_folder, f"profile_{self.run_id}")
+
+        lines = [f"Perfil de ejecución {self.run_id}",
+                 f"Imágenes: {self.file_count} ({self.sampled_count} perfiladas con cProfile, "
+                 f"1 de cada {self.sample_every})" if self.sample_every > 0 else f"Imágenes: {self.file_count} (sin cProfile)",
+                 "",
+                 "Tiempo por etapa (suma de todas las imágenes):"]
+        total_time = sum(self.stage_totals.values()) or 1e-9
+        for stage in HISTORY_STAGES:
+            seconds = self.stage_totals.get(stage, 0.0)
+            lines.append(f"  {stage:<8} {seconds:10.3f} s  {100 * seconds / total_time:5.1f} %  "
+                         f"media {seconds / max(self.stage_counts[stage], 1):.4f} s")
+
+        lines += ["",
+                  "Memoria (tracemalloc; solo el heap de Python, los píxeles que reserva Pillow en C no aparecen):",
+                  f"  Pico total: {format_megabytes(peak_traced)}"]
+        for stage in HISTORY_STAGES:
+            if stage in self.stage_memory_peaks:
+                lines.append(f"  Pico en {stage:<8} +{format_megabytes(self.stage_memory_peaks[stage])} sobre la memoria previa a la imagen")
+        if resource is not None:
+            # ru_maxrss está en KB en Linux y en bytes en macOS
+            max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+            max_rss_bytes = max_rss if sys.platform == "darwin" else max_rss * 1024
+            lines.append(f"  Pico de memoria del proceso (RSS): {format_megabytes(max_rss_bytes)}")
+
+        if self.profile_stats is not None:
+            self.profile_stats.dump_stats(base_path + ".pstats")
+            stream = io.StringIO()
+            self.profile_stats.stream = stream
+            self.profile_stats.sort_stats("cumulative").print_stats(PROFILE_TOP_FUNCTIONS)
+            lines += ["", f"Funciones más costosas (cProfile, acumulado; archivo completo en {base_path}.pstats):",
+                      stream.getvalue()]
+
+        report_path = base_path + ".txt"
+        with open(report_path, 'w', encoding='utf-8') as f:
+            f.write("\n".join(lines) + "\n")
+        return report_path
+
 
 class ImageWatermarkerApp:
     def __init__(self, master):
@@ -29,7 +812,7 @@ class ImageWatermarkerApp:
         
         # Dimensiones de la ventana principal
         window_width = 750
-        window_height = 680
+        window_height = 760
         
         # Obtener las dimensiones de la pantalla
         screen_width = self.master.winfo_screenwidth()
@@ -101,16 +884,26 @@ class ImageWatermarkerApp:
         self.margin_value = tk.IntVar(value=20)
         self.center_offset_px = tk.IntVar(value=100)
 
+        # Motor de render (Pillow por defecto, libvips opcional)
+        self.render_backend = tk.StringVar(value=DEFAULT_BACKEND)
+
+        # Modo de perfilado (no se guarda entre sesiones)
+        self.profile_enabled = tk.BooleanVar(value=False)
+
+        # Presupuesto de memoria del planificador (MB)
+        self.memory_budget_mb = tk.IntVar(value=SCHEDULER_MEMORY_BUDGET_MB)
+
         # Variables para la gestión de marcas de agua guardadas
         self.watermark_presets_file = "watermark_presets.json"
         self.watermark_presets = []
 
         # Variables para guardar las rutas de carpetas y settings de trazo
         self.app_settings_file = "app_settings.json"
+        self.run_history_file = RUN_HISTORY_FILE
         self.load_app_settings()
 
         # Configuración de la fuente Poppins
-        self.font_name = "Poppins-Medium.ttf"
+        self.font_name = FONT_NAME
         self.poppins_font_url = "https://github.com/google/fonts/raw/main/ofl/poppins/Poppins-Medium.ttf"
         self.my_font_path = self.download_font_if_not_exists(self.font_name, self.poppins_font_url, ".")
 
@@ -164,6 +957,8 @@ class ImageWatermarkerApp:
                     self.output_folder_path.set(settings.get('output_folder', ''))
                     self.stroke_width.set(settings.get('stroke_width', 3))
                     self.watermark_position.set(settings.get('watermark_position', 'random')) 
+                    self.render_backend.set(settings.get('render_backend', DEFAULT_BACKEND))
+                    self.memory_budget_mb.set(settings.get('memory_budget_mb', SCHEDULER_MEMORY_BUDGET_MB))
             except json.JSONDecodeError:
                 messagebox.showwarning("Error al cargar settings", "El archivo de configuración está corrupto. Se iniciará con rutas y configuraciones por defecto.")
         # Si no existe el archivo, las variables ya están vacías con sus valores por defecto
@@ -174,7 +969,9 @@ class ImageWatermarkerApp:
             'input_folder': self.input_folder_path.get(),
             'output_folder': self.output_folder_path.get(),
             'stroke_width': self.stroke_width.get(),
-            'watermark_position': self.watermark_position.get()
+            'watermark_position': self.watermark_position.get(),
+            'render_backend': self.render_backend.get(),
+            'memory_budget_mb': self.memory_budget_mb.get()
         }
         try:
             with open(self.app_settings_file, 'w', encoding='utf-8') as f:
@@ -217,6 +1014,16 @@ class ImageWatermarkerApp:
         ttk.Label(watermark_config_frame, text="Margen (px):").grid(row=1, column=4, padx=5, pady=5, sticky="w")
         ttk.Spinbox(watermark_config_frame, from_=0, to_=100, textvariable=self.margin_value, width=5).grid(row=1, column=5, padx=5, pady=5, sticky="w")
 
+        # Fila 2: Motor de render
+        ttk.Label(watermark_config_frame, text="Motor de Render:").grid(row=2, column=0, padx=5, pady=5, sticky="w")
+        ttk.Combobox(watermark_config_frame, textvariable=self.render_backend, values=list(RENDER_BACKENDS),
+                     state="readonly", width=10).grid(row=2, column=1, columnspan=2, padx=5, pady=5, sticky="w")
+        ttk.Checkbutton(watermark_config_frame, text="Modo de Perfilado", variable=self.profile_enabled).grid(row=2, column=3, columnspan=3, padx=5, pady=5, sticky="w")
+
+        # Fila 3: Presupuesto de memoria del planificador
+        ttk.Label(watermark_config_frame, text="Memoria Máx. (MB):").grid(row=3, column=0, padx=5, pady=5, sticky="w")
+        ttk.Spinbox(watermark_config_frame, from_=256, to_=65536, increment=256, textvariable=self.memory_budget_mb, width=7).grid(row=3, column=1, padx=5, pady=5, sticky="w")
+
         for i in range(6):
             watermark_config_frame.grid_columnconfigure(i, weight=1)
 
@@ -424,107 +1231,20 @@ class ImageWatermarkerApp:
         """
         Intenta cargar la fuente Poppins. Si no está disponible localmente, usará la predeterminada.
         """
-        # Determina la ruta base para la fuente
-        base_path = sys._MEIPASS if hasattr(sys, '_MEIPASS') else os.path.dirname(os.path.abspath(__file__))
-        font_full_path = os.path.join(base_path, self.font_name)
-
-        if os.path.exists(font_full_path):
-            try:
-                return ImageFont.truetype(font_full_path, font_size)
-            except IOError:
-                print(f"Error al cargar la fuente en {font_full_path}. Usando la fuente predeterminada de Pillow.")
-                return ImageFont.load_default()
-        else:
-            print(f"No se encontró la fuente Poppins descargada en {font_full_path}. Usando la fuente predeterminada de Pillow.")
-            return ImageFont.load_default()
+        return get_font(font_size, self.font_name)
 
 
     def add_watermark_to_image(self, image_path, output_folder, watermark_text, font_size, 
                                 water_position, margin, center_offset_value, center_offset_option_selected, 
-                                stroke_width):
+                                stroke_width, stats=None, backend=DEFAULT_BACKEND, profiler=None):
         """
         Añade una marca de agua de texto a una imagen individual en la posición especificada.
         Aplica la orientación EXIF y guarda la salida como JPG.
         """
-        try:
-            with Image.open(image_path) as img:
-                img = ImageOps.exif_transpose(img)
-                img = img.convert("RGBA")
-
-                draw = ImageDraw.Draw(img)
-
-                font = self.get_font(font_size)
-
-                fill_color = (255, 255, 255, 255) # Blanco opaco
-                stroke_color = (0, 0, 0, 255)   # Negro opaco
-
-                bbox = draw.textbbox((0,0), watermark_text, font=font, stroke_width=stroke_width)
-                text_width = bbox[2] - bbox[0]
-                text_height = bbox[3] - bbox[1]
-
-                img_width, img_height = img.size
-                
-                x, y = 0.0, 0.0
-
-                if water_position == "top_left":
-                    x = margin
-                    y = margin
-                elif water_position == "top_right":
-                    x = img_width - text_width - margin
-                    y = margin
-                elif water_position == "bottom_left":
-                    x = margin
-                    y = img_height - text_height - margin
-                elif water_position == "bottom_right":
-                    x = img_width - text_width - margin
-                    y = img_height - text_height - margin
-                elif water_position == "random":
-                    effective_max_x = img_width - text_width - margin
-                    effective_max_y = img_height - text_height - margin
-
-                    x_min = margin
-                    y_min = margin
-
-                    x = random.randint(x_min if x_min <= effective_max_x else 0, effective_max_x if effective_max_x >= 0 else 0)
-                    y = random.randint(y_min if y_min <= effective_max_y else 0, effective_max_y if effective_max_y >= 0 else 0)
-
-
-                elif water_position == "center_options":
-                    base_x = (img_width - text_width) / 2
-                    base_y = (img_height - text_height) / 2
-                    
-                    if center_offset_option_selected == "center":
-                        x = base_x
-                        y = base_y
-                    elif center_offset_option_selected == "center_offset_up":
-                        x = base_x
-                        y = base_y - center_offset_value
-                    elif center_offset_option_selected == "center_offset_down":
-                        x = base_x
-                        y = base_y + center_offset_value
-                    elif center_offset_option_selected == "center_offset_left":
-                        x = base_x - center_offset_value
-                        y = base_y
-                    elif center_offset_option_selected == "center_offset_right":
-                        x = base_x + center_offset_value
-                        y = base_y
-                
-                x = int(max(0, min(x, img_width - text_width)))
-                y = int(max(0, min(y, img_height - text_height)))
-
-                draw.text((x, y), watermark_text, font=font, fill=fill_color,
-                          stroke_width=stroke_width, stroke_fill=stroke_color)
-
-                img = img.convert('RGB')
-                
-                output_filename = os.path.splitext(os.path.basename(image_path))[0] + ".jpg"
-                final_output_path = os.path.join(output_folder, output_filename)
-                
-                img.save(final_output_path, quality=90)
-                return True
-        except Exception as e:
-            print(f"Error al procesar la imagen {image_path}: {e}")
-            return False
+        return add_watermark_to_image(image_path, output_folder, watermark_text, font_size,
+                                      water_position, margin, center_offset_value, center_offset_option_selected,
+                                      stroke_width, font_name=self.font_name, stats=stats, backend=backend,
+                                      profiler=profiler)
 
     def start_processing_thread(self):
         """Inicia el proceso de imágenes en un hilo separado y muestra la animación de carga."""
@@ -535,6 +1255,9 @@ class ImageWatermarkerApp:
         position = self.watermark_position.get()
         margin = self.margin_value.get()
         stroke_width = self.stroke_width.get()
+        backend = self.render_backend.get()
+        profile = self.profile_enabled.get()
+        memory_budget_mb = self.memory_budget_mb.get()
         
         center_offset_value = self.center_offset_px.get()
         center_offset_option_selected = self.center_offset_option.get()
@@ -569,7 +1292,7 @@ class ImageWatermarkerApp:
         self.processing_thread = threading.Thread(target=self._process_images_threaded, 
                                                  args=(input_folder, output_folder, watermark_text, font_size,
                                                        position, margin, center_offset_value, center_offset_option_selected,
-                                                       stroke_width))
+                                                       stroke_width, backend, profile, memory_budget_mb))
         self.processing_thread.start()
 
     def animate_loading_dots(self):
@@ -582,11 +1305,23 @@ class ImageWatermarkerApp:
 
     def _process_images_threaded(self, input_folder, output_folder, watermark_text, font_size, 
                                  position, margin, center_offset_value, center_offset_option_selected, 
-                                 stroke_width):
-        """Método de procesamiento de imágenes que se ejecuta en un hilo separado."""
-        supported_extensions = ('.png', '.jpg', '.jpeg', '.bmp', '.gif', '.tiff', '.jfif', '.webp') 
+                                 stroke_width, backend=DEFAULT_BACKEND, profile=False,
+                                 memory_budget_mb=SCHEDULER_MEMORY_BUDGET_MB):
+        """
+        Método de procesamiento de imágenes que se ejecuta en un hilo separado.
+        Las imágenes se reparten entre varios hilos con AdaptiveScheduler.
+        """
         processed_count = 0
         skipped_count = 0
+        file_stats = []
+        peak_workers = 0
+        started_at = time.time()
+        run_start = time.perf_counter()
+
+        profiler = None
+        if profile:
+            profiler = RunProfiler(make_run_id(started_at))
+            profiler.start()
         
         # Recopilar todos los archivos en la carpeta de entrada
         all_files_in_input_folder = [f for f in os.listdir(input_folder) if os.path.isfile(os.path.join(input_folder, f))]
@@ -594,38 +1329,65 @@ class ImageWatermarkerApp:
         # Contar solo los archivos compatibles para un conteo más preciso del "total" a procesar
         total_potential_files = 0
         for filename in all_files_in_input_folder:
-            if filename.lower().endswith(supported_extensions):
+            if filename.lower().endswith(SUPPORTED_EXTENSIONS):
                 total_potential_files += 1
 
-        if total_potential_files == 0:
-            # Si no hay archivos compatibles, considera esto como un error en sí mismo
-            final_message_type = "no_images_processed"
-        else:
+        if total_potential_files > 0:
+            image_jobs = []
             for filename in all_files_in_input_folder:
-                if filename.lower().endswith(supported_extensions):
+                if filename.lower().endswith(SUPPORTED_EXTENSIONS):
                     image_path = os.path.join(input_folder, filename)
-                    if self.add_watermark_to_image(image_path, output_folder, watermark_text, font_size,
-                                                   position, margin, center_offset_value, center_offset_option_selected,
-                                                   stroke_width):
-                        processed_count += 1
-                    else:
-                        skipped_count += 1
+                    image_jobs.append((image_path, probe_image_cost(image_path)))
                 else:
                     # Contabilizar archivos no compatibles también como saltados
                     skipped_count += 1
+                    file_stats.append(unsupported_file_stats(filename))
+
+            def process_image(image_path):
+                stats = {}
+                ok = self.add_watermark_to_image(image_path, output_folder, watermark_text, font_size,
+                                                 position, margin, center_offset_value, center_offset_option_selected,
+                                                 stroke_width, stats=stats, backend=backend, profiler=profiler)
+                return ok, stats
+
+            scheduler = AdaptiveScheduler(memory_budget_mb * 1024 * 1024)
+            for image_path, (ok, stats) in scheduler.run(image_jobs, process_image):
+                if ok:
+                    processed_count += 1
+                else:
+                    skipped_count += 1
+                file_stats.append(stats)
+            peak_workers = scheduler.peak_workers
 
-            # Determinar el estado final para el mensaje y el icono
-            if processed_count == total_potential_files and skipped_count == 0:
-                final_message_type = "success" # Todas procesadas sin errores
-            elif processed_count > 0 and skipped_count > 0:
-                final_message_type = "partial_success" # Algunas procesadas, otras no
-            elif processed_count == 0 and skipped_count > 0:
-                final_message_type = "no_images_processed" # Ninguna procesada, solo errores/incompatibles
-            else:
-                final_message_type = "unknown_error" # Fallback para cualquier otro caso inesperado
+        # Determinar el estado final para el mensaje y el icono
+        final_message_type = determine_final_message_type(processed_count, skipped_count, total_potential_files)
+
+        settings = {
+            'watermark_text': watermark_text,
+            'font_size': font_size,
+            'water_position': position,
+            'margin': margin,
+            'center_offset_value': center_offset_value,
+            'center_offset_option_selected': center_offset_option_selected,
+            'stroke_width': stroke_width,
+            'backend': backend,
+        }
+        append_run_record(build_run_record("gui", input_folder, output_folder, settings, file_stats,
+                                           processed_count, skipped_count, final_message_type,
+                                           started_at, time.perf_counter() - run_start, peak_workers),
+                          self.run_history_file)
+        profile_note = None
+        if profiler is not None:
+            # Sin consola (ventana o PyInstaller) el usuario solo ve el diálogo final, así que la ruta
+            # del informe se muestra ahí; un error al escribirlo no debe dejar la interfaz bloqueada
+            try:
+                profile_note = f"Informe de perfilado guardado en: {os.path.abspath(profiler.finish())}"
+            except OSError as e:
+                profile_note = f"No se pudo guardar el informe de perfilado: {e}"
+            print(profile_note)
         
         self.master.after(0, self.stop_processing_ui, processed_count, skipped_count, 
-                          final_message_type, output_folder)
+                          final_message_type, output_folder, profile_note)
 
     def play_sound(self, sound_file):
         """Reproduce un archivo de sonido usando pygame.mixer."""
@@ -647,7 +1409,7 @@ class ImageWatermarkerApp:
         else:
             print(f"Advertencia de Sonido: El archivo de sonido '{sound_file}' no se encontró en la ruta: {sound_filepath}.")
 
-    def show_custom_success_message(self, processed_count, skipped_count, output_folder):
+    def show_custom_success_message(self, processed_count, skipped_count, output_folder, profile_note=None):
         """Muestra un mensaje de éxito personalizado con un check (✔)."""
         top = tk.Toplevel(self.master)
         top.title("Proceso Completado")
@@ -658,7 +1420,7 @@ class ImageWatermarkerApp:
         screen_height = top.winfo_screenheight()
 
         top_width = 480
-        top_height = 280 
+        top_height = 280 if profile_note is None else 360 
         
         top_x = (screen_width // 2) - (top_width // 2)
         top_y = (screen_height // 2) - (top_height // 2)
@@ -671,10 +1433,9 @@ class ImageWatermarkerApp:
 
         ttk.Label(frame, text="✔", font=("Arial", 48, "bold"), foreground="green").pack(pady=(0, 5)) 
         
-        message = f"Proceso de marca de agua finalizado con éxito.\n\n" \
-                  f"Imágenes procesadas: {processed_count}\n" \
-                  f"Imágenes saltadas (no compatibles/error): {skipped_count}\n" \
-                  f"Revisa la carpeta: {os.path.abspath(output_folder)}"
+        message = format_summary_message(FINAL_MESSAGES["success"], processed_count, skipped_count, output_folder)
+        if profile_note is not None:
+            message += f"\n\n{profile_note}"
         
         ttk.Label(frame, text=message, font=("Arial", 10), wraplength=top_width - 40, justify=tk.CENTER).pack(pady=(5, 15))
         
@@ -682,7 +1443,7 @@ class ImageWatermarkerApp:
         
         self.master.wait_window(top)
 
-    def show_custom_error_message(self, processed_count, skipped_count, output_folder, main_message):
+    def show_custom_error_message(self, processed_count, skipped_count, output_folder, main_message, profile_note=None):
         """Muestra un mensaje de error personalizado con una 'X'."""
         top = tk.Toplevel(self.master)
         top.title("Error de Procesamiento")
@@ -693,7 +1454,7 @@ class ImageWatermarkerApp:
         screen_height = top.winfo_screenheight()
 
         top_width = 480
-        top_height = 280
+        top_height = 280 if profile_note is None else 360
         
         top_x = (screen_width // 2) - (top_width // 2)
         top_y = (screen_height // 2) - (top_height // 2)
@@ -706,10 +1467,9 @@ class ImageWatermarkerApp:
 
         ttk.Label(frame, text="❌", font=("Arial", 48, "bold"), foreground="red").pack(pady=(0, 5)) 
         
-        message = f"{main_message}\n\n" \
-                  f"Imágenes procesadas: {processed_count}\n" \
-                  f"Imágenes saltadas (no compatibles/error): {skipped_count}\n" \
-                  f"Revisa la carpeta: {os.path.abspath(output_folder)}"
+        message = format_summary_message(main_message, processed_count, skipped_count, output_folder)
+        if profile_note is not None:
+            message += f"\n\n{profile_note}"
         
         ttk.Label(frame, text=message, font=("Arial", 10), wraplength=top_width - 40, justify=tk.CENTER).pack(pady=(5, 15))
         
@@ -717,8 +1477,11 @@ class ImageWatermarkerApp:
         
         self.master.wait_window(top)
 
-    def stop_processing_ui(self, processed_count, skipped_count, final_message_type, output_folder):
-        """Detiene la animación, muestra el resultado y re-habilita la UI."""
+    def stop_processing_ui(self, processed_count, skipped_count, final_message_type, output_folder, profile_note=None):
+        """
+        Detiene la animación, muestra el resultado y re-habilita la UI.
+        profile_note es la línea sobre el informe de perfilado, si el modo de perfilado estaba activo.
+        """
         self.loading_animation_active = False
         self.loading_label.config(text="") # Ocultar la etiqueta de carga
 
@@ -734,21 +1497,573 @@ class ImageWatermarkerApp:
 
         if final_message_type == "success": # Éxito total
             self.play_sound(SOUND_FILE) # Reproducir sonido de éxito
-            self.show_custom_success_message(processed_count, skipped_count, output_folder)
+            self.show_custom_success_message(processed_count, skipped_count, output_folder, profile_note)
         else: # Si hubo errores (parciales o totales)
-            main_error_message = ""
-            if final_message_type == "partial_success":
-                main_error_message = "Algunas imágenes se crearon satisfactoriamente y otras no."
-            elif final_message_type == "no_images_processed":
-                main_error_message = "No se pudo procesar ninguna imagen."
-            else: # Caso de error desconocido o general
-                main_error_message = "Se produjo un error inesperado durante el procesamiento."
+            # Caso de error desconocido o general si el tipo no está en la tabla
+            main_error_message = FINAL_MESSAGES.get(final_message_type, UNKNOWN_ERROR_MESSAGE)
             
             self.play_sound(ERROR_SOUND_FILE) # Reproducir sonido de error
-            self.show_custom_error_message(processed_count, skipped_count, output_folder, main_error_message)
+            self.show_custom_error_message(processed_count, skipped_count, output_folder, main_error_message, profile_note)
+
+
+# --- Cola de trabajo distribuida (modo multi-nodo) ---
+QUEUE_BATCH_SIZE = 32         # Archivos reclamados por cada worker en cada vuelta (se procesan en paralelo)
+QUEUE_LEASE_SECONDS = 300     # Tiempo que un worker puede retener un lote sin renovarlo
+QUEUE_MAX_ATTEMPTS = 3        # Reintentos antes de dar un archivo por fallido
+QUEUE_POLL_SECONDS = 5        # Espera entre consultas cuando otros workers tienen lotes reclamados
+QUEUE_CLOCK_SKEW_SECONDS = 30 # Margen antes de dar un lease por vencido, por diferencias de reloj entre hosts
+
+QUEUE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS run (
+    id INTEGER PRIMARY KEY CHECK (id = 1),
+    input_folder TEXT NOT NULL,
+    output_folder TEXT NOT NULL,
+    settings TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    recorded_at REAL
+);
+CREATE TABLE IF NOT EXISTS tasks (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    filename TEXT NOT NULL UNIQUE,
+    status TEXT NOT NULL,
+    lease_owner TEXT,
+    lease_expires REAL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    cost INTEGER NOT NULL DEFAULT 0,
+    error TEXT,
+    stats TEXT,
+    updated_at REAL
+);
+CREATE INDEX IF NOT EXISTS tasks_status ON tasks (status, lease_expires);
+"""
+
+# Columnas añadidas después de la primera versión del esquema. CREATE TABLE IF NOT EXISTS no toca
+# las tablas de una cola creada con una versión anterior, así que se añaden al abrirla.
+QUEUE_MIGRATIONS = (
+    ("run", "recorded_at", "REAL"),
+    ("tasks", "stats", "TEXT"),
+    ("tasks", "cost", "INTEGER NOT NULL DEFAULT 0"),
+)
+
+# Índices sobre columnas migradas: se crean después de la migración
+QUEUE_MIGRATED_INDEXES = """
+CREATE INDEX IF NOT EXISTS tasks_cost ON tasks (status, cost DESC);
+"""
+
+
+class WorkQueue:
+    """
+    Cola de trabajo durable en SQLite para repartir un lote entre procesos de varias máquinas.
+
+    El coordinador enumera la carpeta de entrada una sola vez (enqueue_folder). Cada worker
+    reclama lotes de archivos con un lease que expira; si el worker muere, el lease vence y
+    otro worker vuelve a poner esos archivos en cola. Estados de una tarea:
+    pending -> leased -> done | failed, y skipped para archivos no compatibles.
+
+    La base de datos debe vivir en un volumen compartido. Se usa el journal por defecto
+    (no WAL) porque WAL no funciona sobre sistemas de archivos de red.
+
+    Los vencimientos de los leases se calculan con el reloj de cada host, así que todos los
+    hosts deben tener el reloj sincronizado (NTP). Un lease solo se da por vencido
+    QUEUE_CLOCK_SKEW_SECONDS después de su vencimiento, para tolerar pequeñas diferencias.
+    """
+
+    def __init__(self, db_path, timeout=30.0):
+        self.db_path = db_path
+        # isolation_level=None: las transacciones se abren a mano con BEGIN IMMEDIATE
+        self.conn = sqlite3.connect(db_path, timeout=timeout, isolation_level=None)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.executescript(QUEUE_SCHEMA)
+        self._transaction(self._migrate)
+        self.conn.executescript(QUEUE_MIGRATED_INDEXES)
+
+    def _migrate(self):
+        """Añade las columnas que falten a una cola creada con una versión anterior del programa."""
+        # Se comprueba dentro de la transacción: otro worker puede estar migrando la misma base
+        for table, column, definition in QUEUE_MIGRATIONS:
+            columns = {row['name'] for row in self.conn.execute(f"PRAGMA table_info({table})")}
+            if column not in columns:
+                self.conn.execute(f"ALTER TABLE {table} ADD COLUMN {column} {definition}")
+
+    def close(self):
+        self.conn.close()
+
+    def _transaction(self, callback):
+        """Ejecuta callback dentro de una transacción con bloqueo de escritura."""
+        self.conn.execute("BEGIN IMMEDIATE")
+        try:
+            result = callback()
+        except Exception:
+            self.conn.execute("ROLLBACK")
+            raise
+        self.conn.execute("COMMIT")
+        return result
+
+    def enqueue_folder(self, input_folder, output_folder, settings):
+        """
+        Registra la configuración del lote y encola los archivos de la carpeta de entrada.
+        Volver a ejecutarlo solo añade archivos nuevos; la configuración original se conserva.
+        El coste de cada imagen se estima aquí leyendo su cabecera, para repartirlas de mayor a menor.
+        Devuelve la cantidad de archivos nuevos encolados.
+        """
+        known_files = {row["filename"] for row in self.conn.execute("SELECT filename FROM tasks")}
+        new_tasks = []
+        for filename in sorted(os.listdir(input_folder)):
+            image_path = os.path.join(input_folder, filename)
+            if filename in known_files or not os.path.isfile(image_path):
+                continue
+            # Los archivos no compatibles cuentan como saltados, igual que en la GUI
+            if filename.lower().endswith(SUPPORTED_EXTENSIONS):
+                new_tasks.append((filename, "pending", probe_image_cost(image_path)))
+            else:
+                new_tasks.append((filename, "skipped", 0))
+
+        def enqueue():
+            now = time.time()
+            self.conn.execute("INSERT OR IGNORE INTO run (id, input_folder, output_folder, settings, created_at) "
+                              "VALUES (1, ?, ?, ?, ?)",
+                              (os.path.abspath(input_folder), os.path.abspath(output_folder),
+                               json.dumps(settings, ensure_ascii=False), now))
+            added = 0
+            for filename, status, cost in new_tasks:
+                cursor = self.conn.execute("INSERT OR IGNORE INTO tasks (filename, status, cost, updated_at) VALUES (?, ?, ?, ?)",
+                                           (filename, status, cost, now))
+                added += cursor.rowcount
+            return added
+
+        return self._transaction(enqueue)
+
+    def get_run(self):
+        """Devuelve (input_folder, output_folder, settings) o None si la cola no tiene lote."""
+        row = self.conn.execute("SELECT input_folder, output_folder, settings FROM run WHERE id = 1").fetchone()
+        if row is None:
+            return None
+        return row["input_folder"], row["output_folder"], json.loads(row["settings"])
+
+    def claim_batch(self, worker_id, batch_size=QUEUE_BATCH_SIZE, lease_seconds=QUEUE_LEASE_SECONDS):
+        """
+        Reclama hasta batch_size archivos pendientes para worker_id, los de mayor coste primero.
+        Antes de reclamar, devuelve a la cola los leases vencidos de workers caídos y da por
+        fallidos los archivos que ya agotaron sus intentos. Devuelve una lista de (id, filename, cost).
+        """
+        def claim():
+            now = time.time()
+            expired_before = now - QUEUE_CLOCK_SKEW_SECONDS
+            self.conn.execute("UPDATE tasks SET status = 'failed', lease_owner = NULL, lease_expires = NULL, "
+                              "error = 'Lease vencido tras agotar los intentos', updated_at = ? "
+                              "WHERE status = 'leased' AND lease_expires < ? AND attempts >= ?",
+                              (now, expired_before, QUEUE_MAX_ATTEMPTS))
+            self.conn.execute("UPDATE tasks SET status = 'pending', lease_owner = NULL, lease_expires = NULL, updated_at = ? "
+                              "WHERE status = 'leased' AND lease_expires < ?",
+                              (now, expired_before))
+            rows = self.conn.execute("SELECT id, filename, cost FROM tasks WHERE status = 'pending' ORDER BY cost DESC, id LIMIT ?",
+                                     (batch_size,)).fetchall()
+            self.conn.executemany("UPDATE tasks SET status = 'leased', lease_owner = ?, lease_expires = ?, "
+                                  "attempts = attempts + 1, updated_at = ? WHERE id = ?",
+                                  [(worker_id, now + lease_seconds, now, row["id"]) for row in rows])
+            return [(row["id"], row["filename"], row["cost"]) for row in rows]
+
+        return self._transaction(claim)
+
+    def renew_leases(self, worker_id, lease_seconds=QUEUE_LEASE_SECONDS):
+        """Extiende los leases que worker_id todavía retiene."""
+        now = time.time()
+        self.conn.execute("UPDATE tasks SET lease_expires = ?, updated_at = ? WHERE status = 'leased' AND lease_owner = ?",
+                          (now + lease_seconds, now, worker_id))
+
+    def complete(self, task_id, worker_id, ok, error=None, stats=None):
+        """
+        Registra el resultado de un archivo y sus métricas para el historial. Si el lease ya
+        no pertenece a worker_id (venció y otro worker lo reclamó), el resultado se descarta
+        y devuelve False.
+        """
+        cursor = self.conn.execute("UPDATE tasks SET status = ?, error = ?, stats = ?, lease_owner = NULL, lease_expires = NULL, updated_at = ? "
+                                   "WHERE id = ? AND status = 'leased' AND lease_owner = ?",
+                                   ("done" if ok else "failed", error,
+                                    json.dumps(stats, ensure_ascii=False) if stats is not None else None,
+                                    time.time(), task_id, worker_id))
+        return cursor.rowcount == 1
+
+    def status_counts(self):
+        """Devuelve un diccionario {estado: cantidad}."""
+        counts = {"pending": 0, "leased": 0, "done": 0, "failed": 0, "skipped": 0}
+        for row in self.conn.execute("SELECT status, COUNT(*) AS n FROM tasks GROUP BY status"):
+            counts[row["status"]] = row["n"]
+        return counts
+
+    def is_finished(self):
+        counts = self.status_counts()
+        return counts["pending"] == 0 and counts["leased"] == 0
+
+    def file_stats(self):
+        """Devuelve las métricas por archivo de todas las tareas terminadas."""
+        file_stats = []
+        for row in self.conn.execute("SELECT filename, status, error, stats FROM tasks ORDER BY id"):
+            if row["stats"]:
+                file_stats.append(json.loads(row["stats"]))
+            elif row["status"] == "skipped":
+                file_stats.append(unsupported_file_stats(row["filename"]))
+            elif row["status"] == "failed":
+                file_stats.append({'file': row["filename"], 'error_type': "LeaseExpired", 'error': row["error"], 'timings': {}})
+        return file_stats
+
+    def mark_recorded(self):
+        """
+        Marca el lote como guardado en el historial. Devuelve True solo para el primer proceso
+        que lo consigue, así el lote se registra una sola vez aunque terminen varios workers.
+        """
+        cursor = self.conn.execute("UPDATE run SET recorded_at = ? WHERE id = 1 AND recorded_at IS NULL", (time.time(),))
+        return cursor.rowcount == 1
+
+    def summary(self):
+        """
+        Devuelve (processed_count, skipped_count, final_message_type, output_folder),
+        los mismos valores que recibe stop_processing_ui al terminar un lote en la GUI.
+        """
+        counts = self.status_counts()
+        run = self.get_run()
+        output_folder = run[1] if run else ""
+        processed_count = counts["done"]
+        skipped_count = counts["failed"] + counts["skipped"]
+        total_potential_files = sum(counts.values()) - counts["skipped"]
+        final_message_type = determine_final_message_type(processed_count, skipped_count, total_potential_files)
+        return processed_count, skipped_count, final_message_type, output_folder
+
+
+def run_queue_worker(queue, worker_id, batch_size=QUEUE_BATCH_SIZE, lease_seconds=QUEUE_LEASE_SECONDS,
+                     input_folder=None, output_folder=None, poll_seconds=QUEUE_POLL_SECONDS, profiler=None,
+                     memory_budget_mb=SCHEDULER_MEMORY_BUDGET_MB, max_workers=SCHEDULER_MAX_WORKERS):
+    """
+    Bucle de un worker: reclama lotes, aplica la marca de agua y registra los resultados
+    hasta que no quedan archivos pendientes ni reclamados por otros workers.
+    input_folder/output_folder permiten usar otra ruta de montaje del volumen compartido.
+    Con un RunProfiler en profiler, cada imagen se procesa a través del perfilador.
+    Cada lote se reparte entre hilos con AdaptiveScheduler; el planificador se conserva entre
+    lotes para no volver a aprender la cantidad de hilos. Los leases se renuevan cada
+    tercio de lease_seconds mientras haya imágenes en curso, no solo al terminar cada una.
+    Devuelve (procesadas, fallidas) por este worker.
+    """
+    run = queue.get_run()
+    if run is None:
+        raise ValueError(f"La cola '{queue.db_path}' no tiene ningún lote. Ejecuta primero 'queue-init'.")
+    run_input_folder, run_output_folder, settings = run
+    input_folder = input_folder or run_input_folder
+    output_folder = output_folder or run_output_folder
+    os.makedirs(output_folder, exist_ok=True)
+
+    def process_image(filename):
+        stats = {}
+        ok = add_watermark_to_image(os.path.join(input_folder, filename), output_folder, **settings,
+                                    stats=stats, profiler=profiler)
+        return ok, stats
+
+    scheduler = AdaptiveScheduler(memory_budget_mb * 1024 * 1024, max_workers)
+    processed_count = 0
+    failed_count = 0
+    while True:
+        batch = queue.claim_batch(worker_id, batch_size, lease_seconds)
+        if not batch:
+            if queue.is_finished():
+                break
+            # Otros workers tienen lotes reclamados; esperar por si sus leases vencen
+            time.sleep(poll_seconds)
+            continue
+
+        task_ids = {filename: task_id for task_id, filename, cost in batch}
+        jobs = [(filename, cost) for task_id, filename, cost in batch]
+        def renew_leases():
+            queue.renew_leases(worker_id, lease_seconds)
+
+        for filename, (ok, stats) in scheduler.run(jobs, process_image, heartbeat=renew_leases,
+                                                   heartbeat_seconds=lease_seconds / 3):
+            if queue.complete(task_ids[filename], worker_id, ok, stats.get('error'), stats):
+                if ok:
+                    processed_count += 1
+                else:
+                    failed_count += 1
+            else:
+                print(f"Advertencia: el lease de '{filename}' venció antes de terminar; se descarta el resultado de este worker.")
+
+    return processed_count, failed_count
+
+
+def record_queue_run(queue, history_file=RUN_HISTORY_FILE):
+    """Guarda el lote en el historial cuando ha terminado, una sola vez por cola."""
+    if not queue.is_finished() or not queue.mark_recorded():
+        return
+    input_folder, output_folder, settings = queue.get_run()
+    processed_count, skipped_count, final_message_type, output_folder = queue.summary()
+    file_stats = queue.file_stats()
+    # El lote dura desde que empezó el primer archivo hasta que terminó el último, en cualquier worker
+    timed = [f for f in file_stats if f.get('started_at')]
+    if timed:
+        started_at = min(f['started_at'] for f in timed)
+        elapsed_seconds = max(f['started_at'] + sum(f['timings'].values()) for f in timed) - started_at
+    else:
+        started_at, elapsed_seconds = time.time(), 0.0
+    append_run_record(build_run_record("queue", input_folder, output_folder, settings, file_stats,
+                                       processed_count, skipped_count, final_message_type,
+                                       started_at, elapsed_seconds),
+                      history_file)
+
+
+def print_queue_summary(queue):
+    """Imprime el resumen del lote con el mismo formato que los diálogos de la GUI."""
+    processed_count, skipped_count, final_message_type, output_folder = queue.summary()
+    counts = queue.status_counts()
+    if not queue.is_finished():
+        main_message = f"Lote en curso: {counts['pending']} pendientes, {counts['leased']} en proceso."
+    else:
+        main_message = FINAL_MESSAGES.get(final_message_type, UNKNOWN_ERROR_MESSAGE)
+    print(format_summary_message(main_message, processed_count, skipped_count, output_folder))
+    return final_message_type
+
+
+def cmd_queue_init(args):
+    settings = {
+        'watermark_text': args.text,
+        'font_size': args.font_size,
+        'water_position': args.position,
+        'margin': args.margin,
+        'center_offset_value': args.center_offset,
+        'center_offset_option_selected': args.center_option,
+        'stroke_width': args.stroke_width,
+        'backend': args.backend,
+    }
+    queue = WorkQueue(args.db)
+    try:
+        added = queue.enqueue_folder(args.input, args.output, settings)
+        print(f"{added} archivos nuevos encolados en {args.db}.")
+    finally:
+        queue.close()
+    return 0
+
+
+def cmd_queue_work(args):
+    worker_id = args.worker_id or f"{socket.gethostname()}:{os.getpid()}"
+    queue = WorkQueue(args.db)
+    profiler = None
+    if args.profile:
+        # El id del worker (host:pid) forma parte del nombre del informe
+        profiler = RunProfiler(make_run_id(time.time()) + "-" + worker_id.replace(":", "-"),
+                               args.profile_dir, args.profile_sample_every)
+        profiler.start()
+    try:
+        processed_count, failed_count = run_queue_worker(queue, worker_id, args.batch_size, args.lease_seconds,
+                                                         args.input, args.output, profiler=profiler,
+                                                         memory_budget_mb=args.memory_budget_mb, max_workers=args.max_workers)
+        if profiler is not None:
+            print(f"Informe de perfilado guardado en: {profiler.finish()}")
+        print(f"Worker {worker_id}: {processed_count} procesadas, {failed_count} con error.")
+        record_queue_run(queue, args.history)
+        print_queue_summary(queue)
+    except ValueError as e:
+        print(f"Error: {e}")
+        return 1
+    finally:
+        queue.close()
+    return 0
+
+
+def cmd_queue_status(args):
+    queue = WorkQueue(args.db)
+    try:
+        record_queue_run(queue, args.history)
+        final_message_type = print_queue_summary(queue)
+    finally:
+        queue.close()
+    return 0 if final_message_type == "success" else 1
+
+
+PARITY_MAX_TOLERANCE = 24     # Diferencia máxima permitida por canal (0-255)
+PARITY_MEAN_TOLERANCE = 1.0   # Diferencia media permitida por canal
+
+
+def create_parity_samples(folder):
+    """
+    Crea imágenes de prueba con los modos que más difieren entre motores: RGBA con orientación
+    EXIF (rotación 90°), RGB, escala de grises de 16 bits, CMYK, paleta con transparencia y LA.
+    Devuelve la lista de rutas.
+    """
+    gradient = Image.linear_gradient("L").resize((960, 640))
+    samples = []
+
+    def save(name, img, **params):
+        sample_path = os.path.join(folder, name)
+        img.save(sample_path, **params)
+        samples.append(sample_path)
+
+    rgba = gradient.convert("RGBA")
+    rgba.putalpha(200)
+    exif = Image.Exif()
+    exif[0x0112] = 6 # Orientation: girar 90° a la derecha
+    save("parity_rgba_exif.png", rgba, exif=exif)
+    save("parity_rgb.jpg", Image.merge("RGB", [gradient, gradient.rotate(180), gradient.transpose(Image.Transpose.FLIP_LEFT_RIGHT)]), quality=95)
+    save("parity_gray16.png", gradient.point(lambda value: value * 256, "I").convert("I;16"))
+    save("parity_cmyk.jpg", Image.merge("CMYK", [gradient, gradient.rotate(180), gradient.transpose(Image.Transpose.FLIP_LEFT_RIGHT), gradient.point(lambda value: value // 4)]), quality=95)
+    save("parity_palette.png", Image.merge("RGB", [gradient, gradient.rotate(180), gradient]).convert("P", palette=Image.Palette.ADAPTIVE), transparency=0)
+    la = gradient.convert("LA")
+    la.putalpha(128)
+    save("parity_la.png", la)
+    return samples
+
+
+def compare_backends(image_path, backend_name, settings, output_folder):
+    """
+    Procesa la misma imagen con Pillow y con backend_name, y devuelve
+    (motor usado, diferencia máxima, diferencia media) entre ambas salidas en valores de píxel.
+    """
+    results = []
+    for name in (DEFAULT_BACKEND, backend_name):
+        backend_folder = os.path.join(output_folder, name)
+        os.makedirs(backend_folder, exist_ok=True)
+        stats = {}
+        if not add_watermark_to_image(image_path, backend_folder, **settings, stats=stats, backend=name):
+            raise ValueError(f"El motor '{name}' no pudo procesar la imagen: {stats.get('error')}")
+        output_path = os.path.join(backend_folder, os.path.splitext(os.path.basename(image_path))[0] + ".jpg")
+        with Image.open(output_path) as output:
+            results.append((stats['backend'], output.convert("RGB")))
+
+    (_, reference), (used_backend, candidate) = results
+    if reference.size != candidate.size:
+        raise ValueError(f"Tamaños distintos: {reference.size} con Pillow y {candidate.size} con '{used_backend}'.")
+    histogram = ImageChops.difference(reference, candidate).convert("L").histogram()
+    max_diff = max(value for value, count in enumerate(histogram) if count)
+    mean_diff = sum(value * count for value, count in enumerate(histogram)) / sum(histogram)
+    return used_backend, max_diff, mean_diff
+
+
+def cmd_backend_parity(args):
+    settings = {
+        'watermark_text': args.text,
+        'font_size': args.font_size,
+        'water_position': "bottom_right",
+        'margin': 20,
+        'center_offset_value': 0,
+        'center_offset_option_selected': "center",
+        'stroke_width': args.stroke_width,
+    }
+    if get_backend(args.backend).name != args.backend:
+        print(f"El motor '{args.backend}' no está disponible; no se pudo comprobar la paridad.")
+        return 1
+    all_passed = True
+    with tempfile.TemporaryDirectory() as folder:
+        image_paths = [args.image] if args.image else create_parity_samples(folder)
+        for image_path in image_paths:
+            try:
+                used_backend, max_diff, mean_diff = compare_backends(image_path, args.backend, settings, folder)
+            except ValueError as e:
+                print(f"Error: {e}")
+                return 1
+            passed = max_diff <= args.max_tolerance and mean_diff <= args.mean_tolerance
+            all_passed = all_passed and passed
+            print(f"{os.path.basename(image_path)}: {used_backend} vs pillow, diferencia máxima {max_diff} "
+                  f"(límite {args.max_tolerance}), media {mean_diff:.3f} (límite {args.mean_tolerance}) "
+                  f"-> {'OK' if passed else 'FALLO'}")
+    return 0 if all_passed else 1
+
+
+def cmd_history(args):
+    records = load_run_history(args.history)
+    if not records:
+        print(f"No hay ejecuciones registradas en '{args.history}'.")
+        return 0
+
+    if args.query == "slowest":
+        print(f"{'Total (s)':>10}  " + "  ".join(f"{stage:>8}" for stage in HISTORY_STAGES) + "  Dimensiones   Tamaño      Archivo")
+        for total, record, file_entry in query_slowest_files(records, args.limit):
+            stage_columns = "  ".join(f"{file_entry['timings'].get(stage, 0.0):8.3f}" for stage in HISTORY_STAGES)
+            dimensions = f"{file_entry.get('width', '?')}x{file_entry.get('height', '?')}"
+            print(f"{total:10.3f}  {stage_columns}  {dimensions:<12}  {format_megabytes(file_entry.get('input_bytes', 0)):<10}  "
+                  f"{file_entry['file']} ({record['started_at']})")
+    elif args.query == "failures":
+        reasons = query_failure_reasons(records)
+        if not reasons:
+            print("No hay errores registrados.")
+        for error_type, count, example in reasons:
+            print(f"{count:6d}  {error_type:<20}  p. ej. {example}")
+    elif args.query == "throughput":
+        print(f"{'Inicio':<19}  {'Modo':<5}  {'Proc.':>6}  {'Salt.':>6}  {'Tiempo (s)':>10}  {'Img/s':>8}  {'MB/s':>8}  {'Hilos':>5}")
+        for started_at, mode, processed_count, skipped_count, throughput in query_throughput(records):
+            print(f"{started_at:<19}  {mode:<5}  {processed_count:6d}  {skipped_count:6d}  {throughput['elapsed_seconds']:10.2f}  "
+                  f"{throughput['images_per_second']:8.2f}  {throughput['input_mb_per_second']:8.2f}  "
+                  f"{throughput.get('peak_workers', '-'):>5}")
+    return 0
+
+
+def build_arg_parser():
+    parser = argparse.ArgumentParser(description="Bulk Watermark Maker. Sin argumentos abre la interfaz gráfica.")
+    subparsers = parser.add_subparsers(dest="command")
+
+    queue_init = subparsers.add_parser("queue-init", help="Crea o amplía una cola de trabajo compartida con las imágenes de una carpeta.")
+    queue_init.add_argument("--db", required=True, help="Archivo SQLite de la cola (en un volumen compartido).")
+    queue_init.add_argument("--input", required=True, help="Carpeta de imágenes de entrada.")
+    queue_init.add_argument("--output", required=True, help="Carpeta de imágenes de salida.")
+    queue_init.add_argument("--text", default="", help="Texto de la marca de agua.")
+    queue_init.add_argument("--font-size", type=int, default=50)
+    queue_init.add_argument("--stroke-width", type=int, default=3)
+    queue_init.add_argument("--position", default="random",
+                            choices=["top_left", "top_right", "bottom_left", "bottom_right", "random", "center_options"])
+    queue_init.add_argument("--margin", type=int, default=20)
+    queue_init.add_argument("--center-option", default="center",
+                            choices=["center", "center_offset_up", "center_offset_down", "center_offset_left", "center_offset_right"])
+    queue_init.add_argument("--center-offset", type=int, default=100)
+    queue_init.add_argument("--backend", default=DEFAULT_BACKEND, choices=sorted(RENDER_BACKENDS),
+                            help="Motor de render; si no está disponible en un worker se usa Pillow.")
+    queue_init.set_defaults(func=cmd_queue_init)
+
+    queue_work = subparsers.add_parser("queue-work", help="Procesa imágenes de una cola compartida hasta vaciarla.")
+    queue_work.add_argument("--db", required=True, help="Archivo SQLite de la cola.")
+    queue_work.add_argument("--worker-id", help="Identificador del worker (por defecto host:pid).")
+    queue_work.add_argument("--batch-size", type=int, default=QUEUE_BATCH_SIZE)
+    queue_work.add_argument("--lease-seconds", type=int, default=QUEUE_LEASE_SECONDS)
+    queue_work.add_argument("--input", help="Ruta local de la carpeta de entrada si el volumen está montado en otra ruta.")
+    queue_work.add_argument("--output", help="Ruta local de la carpeta de salida si el volumen está montado en otra ruta.")
+    queue_work.add_argument("--history", default=RUN_HISTORY_FILE, help="Archivo del historial de ejecuciones.")
+    queue_work.add_argument("--memory-budget-mb", type=int, default=SCHEDULER_MEMORY_BUDGET_MB,
+                            help="Memoria máxima estimada para las imágenes en curso en este worker.")
+    queue_work.add_argument("--max-workers", type=int, default=SCHEDULER_MAX_WORKERS,
+                            help="Máximo de hilos; la cantidad real se adapta a la proporción de CPU/espera de E/S.")
+    queue_work.add_argument("--profile", action="store_true", help="Activa el modo de perfilado (tiempos por etapa, cProfile y tracemalloc).")
+    queue_work.add_argument("--profile-sample-every", type=int, default=PROFILE_SAMPLE_EVERY,
+                            help="Perfilar con cProfile una de cada N imágenes (0 = ninguna).")
+    queue_work.add_argument("--profile-dir", default=PROFILE_FOLDER, help="Carpeta para los informes de perfilado.")
+    queue_work.set_defaults(func=cmd_queue_work)
+
+    queue_status = subparsers.add_parser("queue-status", help="Muestra el resumen de una cola compartida.")
+    queue_status.add_argument("--db", required=True, help="Archivo SQLite de la cola.")
+    queue_status.add_argument("--history", default=RUN_HISTORY_FILE, help="Archivo del historial de ejecuciones.")
+    queue_status.set_defaults(func=cmd_queue_status)
+
+    history = subparsers.add_parser("history", help="Consulta el historial de ejecuciones.")
+    history.add_argument("query", choices=["slowest", "failures", "throughput"],
+                         help="slowest: archivos más lentos; failures: motivos de error; throughput: rendimiento por ejecución.")
+    history.add_argument("--limit", type=int, default=10, help="Cantidad de archivos a mostrar en 'slowest'.")
+    history.add_argument("--history", default=RUN_HISTORY_FILE, help="Archivo del historial de ejecuciones.")
+    history.set_defaults(func=cmd_history)
+
+    parity = subparsers.add_parser("backend-parity", help="Comprueba que un motor de render da el mismo resultado que Pillow.")
+    parity.add_argument("--backend", default="vips", choices=sorted(RENDER_BACKENDS))
+    parity.add_argument("--image", help="Imagen a comparar (por defecto se generan imágenes de prueba de varios modos).")
+    parity.add_argument("--text", default="Bulk Watermark Maker")
+    parity.add_argument("--font-size", type=int, default=50)
+    parity.add_argument("--stroke-width", type=int, default=3)
+    parity.add_argument("--max-tolerance", type=int, default=PARITY_MAX_TOLERANCE, help="Diferencia máxima permitida por canal (0-255).")
+    parity.add_argument("--mean-tolerance", type=float, default=PARITY_MEAN_TOLERANCE, help="Diferencia media permitida por canal.")
+    parity.set_defaults(func=cmd_backend_parity)
+
+    return parser
+
+
+def main(argv=None):
+    args = build_arg_parser().parse_args(argv)
+    if args.command is None:
+        root = tk.Tk()
+        app = ImageWatermarkerApp(root)
+        root.mainloop()
+        return 0
+    return args.func(args)
 
 
 if __name__ == "__main__":
-    root = tk.Tk()
-    app = ImageWatermarkerApp(root)
-    root.mainloop()
+    sys.exit(main())
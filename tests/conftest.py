@@ -0,0 +1,5 @@
+import os
+import sys
+
+# BWMconGUI.py es un script en la raíz del repositorio, no un paquete instalable
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
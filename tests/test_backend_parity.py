@@ -0,0 +1,55 @@
+import os
+
+import pytest
+
+import BWMconGUI as bwm
+
+pytestmark = pytest.mark.skipif(not bwm.PYVIPS_AVAILABLE, reason="pyvips/libvips no está instalado")
+
+SETTINGS = {
+    'watermark_text': "Bulk Watermark Maker",
+    'font_size': 50,
+    'water_position': "bottom_right",
+    'margin': 20,
+    'center_offset_value': 0,
+    'center_offset_option_selected': "center",
+    'stroke_width': 3,
+}
+
+# Modos que libvips no convierte igual que Pillow: el motor vips debe delegar en Pillow
+PILLOW_FALLBACK_SAMPLES = {"parity_gray16.png", "parity_cmyk.jpg"}
+
+
+@pytest.fixture(scope="module")
+def samples(tmp_path_factory):
+    folder = tmp_path_factory.mktemp("samples")
+    return {os.path.basename(path): path for path in bwm.create_parity_samples(str(folder))}
+
+
+@pytest.mark.parametrize("sample_name", [
+    "parity_rgba_exif.png",
+    "parity_rgb.jpg",
+    "parity_gray16.png",
+    "parity_cmyk.jpg",
+    "parity_palette.png",
+    "parity_la.png",
+])
+def test_vips_matches_pillow(samples, sample_name, tmp_path):
+    used_backend, max_diff, mean_diff = bwm.compare_backends(samples[sample_name], "vips", SETTINGS, str(tmp_path))
+
+    if sample_name in PILLOW_FALLBACK_SAMPLES:
+        assert used_backend == "pillow"
+        assert max_diff == 0
+    else:
+        assert used_backend == "vips"
+        assert max_diff <= bwm.PARITY_MAX_TOLERANCE
+        assert mean_diff <= bwm.PARITY_MEAN_TOLERANCE
+
+
+def test_stroke_free_text_matches_pillow(samples, tmp_path):
+    settings = dict(SETTINGS, stroke_width=0)
+    used_backend, max_diff, mean_diff = bwm.compare_backends(samples["parity_rgb.jpg"], "vips", settings, str(tmp_path))
+
+    assert used_backend == "vips"
+    assert max_diff <= bwm.PARITY_MAX_TOLERANCE
+    assert mean_diff <= bwm.PARITY_MEAN_TOLERANCE
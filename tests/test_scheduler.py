@@ -0,0 +1,129 @@
+import threading
+import time
+
+import pytest
+from PIL import Image
+
+import BWMconGUI as bwm
+
+
+class FakeProcess:
+    """process() falso que anota el orden de inicio y los trabajos en curso en cada momento."""
+
+    def __init__(self, seconds=0.02):
+        self.seconds = seconds
+        self.started = []
+        self.in_flight = []
+        self.snapshots = []
+        self._lock = threading.Lock()
+
+    def __call__(self, item):
+        with self._lock:
+            self.started.append(item)
+            self.in_flight.append(item)
+            self.snapshots.append(list(self.in_flight))
+        time.sleep(self.seconds)
+        with self._lock:
+            self.in_flight.remove(item)
+        return item
+
+
+def make_scheduler(memory_budget_bytes, workers):
+    scheduler = bwm.AdaptiveScheduler(memory_budget_bytes, max_workers=workers)
+    # Fija la cantidad de hilos para que la prueba no dependa de los núcleos de la máquina
+    scheduler.min_workers = scheduler.target_workers = scheduler.worker_ceiling = workers
+    return scheduler
+
+
+def test_jobs_start_largest_first():
+    costs = {"a": 10, "b": 300, "c": 0, "d": 40}
+    process = FakeProcess()
+
+    results = list(make_scheduler(10 ** 6, 1).run(list(costs.items()), process))
+
+    assert process.started == ["b", "d", "a", "c"]
+    assert sorted(item for item, result in results) == sorted(costs)
+
+
+def test_admission_respects_memory_budget_in_strict_order():
+    costs = {"grande": 60, "mediano": 50, "pequeno": 30, "minimo": 10}
+    process = FakeProcess()
+
+    list(make_scheduler(100, 4).run(list(costs.items()), process))
+
+    # "minimo" cabría junto a "grande", pero no adelanta a "mediano"
+    assert process.started == ["grande", "mediano", "pequeno", "minimo"]
+    for snapshot in process.snapshots:
+        assert sum(costs[item] for item in snapshot) <= 100
+
+
+def test_job_larger_than_budget_runs_alone():
+    costs = {"enorme": 500, "a": 20, "b": 20}
+    process = FakeProcess()
+
+    list(make_scheduler(100, 4).run(list(costs.items()), process))
+
+    assert process.started[0] == "enorme"
+    assert ["enorme"] in process.snapshots
+    assert all(snapshot == ["enorme"] for snapshot in process.snapshots if "enorme" in snapshot)
+
+
+def test_peak_workers_is_tracked():
+    costs = {str(i): 1 for i in range(8)}
+    scheduler = make_scheduler(10 ** 6, 3)
+
+    list(scheduler.run(list(costs.items()), FakeProcess()))
+
+    assert scheduler.peak_workers == 3
+
+
+def test_adds_threads_while_cpu_is_idle_and_throughput_grows():
+    scheduler = bwm.AdaptiveScheduler(10 ** 6, max_workers=8)
+    scheduler.cpu_count = scheduler.min_workers = scheduler.target_workers = 2
+
+    scheduler._observe(cpu_seconds=0.2, wall_seconds=1.0, work_done=100)
+    assert scheduler.target_workers == 3
+    scheduler._observe(cpu_seconds=0.3, wall_seconds=1.0, work_done=150)
+    assert scheduler.target_workers == 3  # Se mantiene una ventana antes de volver a decidir
+    scheduler._observe(cpu_seconds=0.3, wall_seconds=1.0, work_done=150)
+    assert scheduler.target_workers == 4
+
+
+def test_reverts_thread_that_does_not_add_throughput():
+    # Hilos limitados por el GIL: con más hilos el proceso no usa más CPU ni termina más trabajo
+    scheduler = bwm.AdaptiveScheduler(10 ** 6, max_workers=8)
+    scheduler.cpu_count = scheduler.min_workers = scheduler.target_workers = 2
+
+    scheduler._observe(cpu_seconds=1.0, wall_seconds=1.0, work_done=100)
+    assert scheduler.target_workers == 3
+    scheduler._observe(cpu_seconds=1.0, wall_seconds=1.0, work_done=101)
+    assert scheduler.target_workers == 2
+    scheduler._observe(cpu_seconds=1.0, wall_seconds=1.0, work_done=100)
+    assert scheduler.target_workers == 2  # El techo aprendido impide volver a probar
+
+
+def test_saturated_cpu_sheds_threads_down_to_one_per_core():
+    scheduler = bwm.AdaptiveScheduler(10 ** 6, max_workers=8)
+    scheduler.cpu_count = scheduler.min_workers = 2
+    scheduler.target_workers = 4
+
+    for _ in range(5):
+        scheduler._observe(cpu_seconds=2.0, wall_seconds=1.0, work_done=100)
+
+    assert scheduler.target_workers == 2
+
+
+def test_probe_image_cost_reads_header(tmp_path):
+    image_path = tmp_path / "a.png"
+    Image.new("RGB", (100, 50)).save(image_path)
+
+    assert bwm.probe_image_cost(str(image_path)) == 100 * 50 * (2 * 4 + 4 + 4)
+
+
+@pytest.mark.parametrize("content", [b"no es una imagen", b""])
+def test_probe_image_cost_is_zero_for_unreadable_header(tmp_path, content):
+    image_path = tmp_path / "roto.jpg"
+    image_path.write_bytes(content)
+
+    assert bwm.probe_image_cost(str(image_path)) == 0
+    assert bwm.probe_image_cost(str(tmp_path / "no_existe.jpg")) == 0
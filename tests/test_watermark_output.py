@@ -0,0 +1,30 @@
+import os
+import stat
+
+import pytest
+from PIL import Image
+
+import BWMconGUI as bwm
+
+
+@pytest.fixture
+def umask_022():
+    previous = os.umask(0o022)
+    yield
+    os.umask(previous)
+
+
+@pytest.mark.skipif(os.name == "nt", reason="Windows no aplica permisos POSIX")
+def test_output_respects_umask(tmp_path, umask_022):
+    image_path = tmp_path / "a.png"
+    Image.new("RGB", (64, 48), "navy").save(image_path)
+    output_folder = tmp_path / "out"
+    output_folder.mkdir()
+
+    ok = bwm.add_watermark_to_image(str(image_path), str(output_folder), "Marca", 12,
+                                    "bottom_right", 5, 0, "center", 1, backend="pillow")
+
+    assert ok
+    assert stat.S_IMODE(os.stat(output_folder / "a.jpg").st_mode) == 0o644
+    # Sin temporales huérfanos junto a la salida
+    assert os.listdir(output_folder) == ["a.jpg"]
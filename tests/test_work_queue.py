@@ -0,0 +1,136 @@
+import json
+import os
+import time
+
+import pytest
+from PIL import Image
+
+import BWMconGUI as bwm
+
+LEASE_SECONDS = 1
+
+SETTINGS = {
+    'watermark_text': "Marca",
+    'font_size': 12,
+    'water_position': "bottom_right",
+    'margin': 5,
+    'center_offset_value': 0,
+    'center_offset_option_selected': "center",
+    'stroke_width': 1,
+    'backend': "pillow",
+}
+
+
+@pytest.fixture
+def folders(tmp_path):
+    input_folder = tmp_path / "in"
+    input_folder.mkdir()
+    Image.new("RGB", (64, 48), "navy").save(input_folder / "a.jpg")
+    Image.new("RGB", (32, 24), "teal").save(input_folder / "b.png")
+    (input_folder / "roto.jpg").write_bytes(b"no es una imagen")
+    (input_folder / "notas.txt").write_text("no compatible")
+    return str(input_folder), str(tmp_path / "out")
+
+
+@pytest.fixture
+def db_path(tmp_path, folders):
+    path = str(tmp_path / "cola.db")
+    queue = bwm.WorkQueue(path)
+    queue.enqueue_folder(*folders, SETTINGS)
+    queue.close()
+    return path
+
+
+@pytest.fixture
+def queue(db_path):
+    queue = bwm.WorkQueue(db_path)
+    yield queue
+    queue.close()
+
+
+@pytest.fixture
+def no_clock_skew(monkeypatch):
+    monkeypatch.setattr(bwm, "QUEUE_CLOCK_SKEW_SECONDS", 0)
+
+
+def task_row(queue, filename):
+    return queue.conn.execute("SELECT * FROM tasks WHERE filename = ?", (filename,)).fetchone()
+
+
+def expire_leases():
+    time.sleep(LEASE_SECONDS + 0.1)
+
+
+def test_expired_lease_is_requeued(queue, no_clock_skew):
+    claimed = queue.claim_batch("worker-1", batch_size=1, lease_seconds=LEASE_SECONDS)
+    expire_leases()
+
+    assert queue.claim_batch("worker-2", batch_size=1, lease_seconds=LEASE_SECONDS) == claimed
+    row = task_row(queue, claimed[0][1])
+    assert row["lease_owner"] == "worker-2"
+    assert row["attempts"] == 2
+
+
+def test_lease_is_kept_within_clock_skew_margin(queue):
+    claimed = queue.claim_batch("worker-1", batch_size=3, lease_seconds=LEASE_SECONDS)
+    expire_leases()
+
+    # El lease venció hace menos de QUEUE_CLOCK_SKEW_SECONDS: sigue siendo de worker-1
+    assert queue.claim_batch("worker-2", batch_size=3, lease_seconds=LEASE_SECONDS) == []
+    assert task_row(queue, claimed[0][1])["lease_owner"] == "worker-1"
+
+
+def test_task_fails_after_max_attempts(queue, no_clock_skew):
+    task_id, filename, cost = queue.claim_batch("worker-0", batch_size=1, lease_seconds=LEASE_SECONDS)[0]
+    for attempt in range(1, bwm.QUEUE_MAX_ATTEMPTS):
+        expire_leases()
+        assert queue.claim_batch(f"worker-{attempt}", batch_size=1, lease_seconds=LEASE_SECONDS)[0][1] == filename
+    expire_leases()
+
+    assert all(claimed[1] != filename for claimed in queue.claim_batch("worker-x", lease_seconds=LEASE_SECONDS))
+    row = task_row(queue, filename)
+    assert row["status"] == "failed"
+    assert row["attempts"] == bwm.QUEUE_MAX_ATTEMPTS
+
+
+def test_complete_is_refused_after_lease_moves(queue, no_clock_skew):
+    task_id, filename, cost = queue.claim_batch("worker-1", batch_size=1, lease_seconds=LEASE_SECONDS)[0]
+    expire_leases()
+    queue.claim_batch("worker-2", batch_size=1, lease_seconds=LEASE_SECONDS)
+
+    assert not queue.complete(task_id, "worker-1", True, stats={'file': filename})
+    assert task_row(queue, filename)["status"] == "leased"
+    assert queue.complete(task_id, "worker-2", True, stats={'file': filename})
+    assert task_row(queue, filename)["status"] == "done"
+
+
+def test_summary_matches_gui_counts(queue, folders):
+    processed, failed = bwm.run_queue_worker(queue, "worker-1", lease_seconds=LEASE_SECONDS, poll_seconds=0)
+
+    # La GUI cuenta como saltados tanto los archivos no compatibles como los que fallan
+    assert (processed, failed) == (2, 1)
+    processed_count, skipped_count, final_message_type, output_folder = queue.summary()
+    assert (processed_count, skipped_count) == (2, 2)
+    assert final_message_type == bwm.determine_final_message_type(2, 2, 3) == "partial_success"
+    assert output_folder == os.path.abspath(folders[1])
+    assert sorted(os.listdir(output_folder)) == ["a.jpg", "b.jpg"]
+
+
+def test_run_is_recorded_once(queue, db_path, tmp_path):
+    history_file = str(tmp_path / "historial.jsonl")
+    bwm.record_queue_run(queue, history_file)
+    assert not os.path.exists(history_file)  # El lote aún no ha terminado
+
+    bwm.run_queue_worker(queue, "worker-1", lease_seconds=LEASE_SECONDS, poll_seconds=0)
+    other_worker = bwm.WorkQueue(db_path)
+    try:
+        bwm.record_queue_run(queue, history_file)
+        bwm.record_queue_run(other_worker, history_file)
+    finally:
+        other_worker.close()
+
+    with open(history_file, encoding="utf-8") as f:
+        records = [json.loads(line) for line in f]
+    assert len(records) == 1
+    assert records[0]['mode'] == "queue"
+    assert (records[0]['processed_count'], records[0]['skipped_count']) == (2, 2)